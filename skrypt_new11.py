@@ -1,7 +1,19 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
+import queue
 import random
+import shutil
 import sys
+import tempfile
+import time
+import tracemalloc
 import zlib
+from concurrent.futures import ThreadPoolExecutor
 from sympy import isprime
 
 # genrowanie liczb pierwszych
@@ -15,6 +27,146 @@ def generuj_pierwsze(bity):
         if isprime(liczba):
             return liczba
 
+# jedno zadanie dla procesu roboczego: sprawdza partie losowych kandydatow
+# uzywamy SystemRandom, bo procesy utworzone przez fork mialyby ten sam stan random
+def szukaj_pierwszej(bity, proby=32):
+    los = random.SystemRandom()
+    for _ in range(proby):
+        liczba = los.getrandbits(bity)
+        if isprime(liczba):
+            return liczba
+    return None
+
+# liczba rdzeni dostepnych dla tego procesu (w kontenerze albo przy przypisaniu do rdzeni
+# moze byc mniejsza niz os.cpu_count()), sched_getaffinity nie ma na Windowsie i macOS
+def liczba_rdzeni():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# rownolegle szukanie liczb pierwszych na wszystkich rdzeniach
+# kazdy proces dostaje partie kandydatow, a gdy mamy juz ile trzeba,
+# wyjscie z bloku with wywoluje terminate() i przerywa pozostale procesy
+# jesli proces roboczy zginie, jego zadanie przepada bez wyniku, wiec zadanie starsze
+# niz limit_zadania uznajemy za stracone i zlecamy nowe w jego miejsce
+def generuj_pierwsze_rownolegle(bity, ile, procesy=None, limit_zadania=120.0):
+    procesy = procesy or liczba_rdzeni()
+    if procesy == 1:
+        return [generuj_pierwsze(bity) for _ in range(ile)]
+
+    znalezione = []
+    wyniki = queue.Queue()
+    with multiprocessing.Pool(procesy) as pula:
+        def zlec():
+            return pula.apply_async(szukaj_pierwszej, (bity,), callback=wyniki.put, error_callback=wyniki.put)
+
+        w_toku = [(zlec(), time.monotonic()) for _ in range(procesy)]
+        while len(znalezione) < ile:
+            try:
+                liczba = wyniki.get(timeout=1.0)
+            except queue.Empty:
+                liczba = None
+            else:
+                if isinstance(liczba, Exception):
+                    raise liczba
+                if liczba is not None and liczba not in znalezione:
+                    znalezione.append(liczba)
+            teraz = time.monotonic()
+            w_toku = [(wynik, start) for wynik, start in w_toku
+                      if not wynik.ready() and teraz - start < limit_zadania]
+            while len(w_toku) < procesy:
+                w_toku.append((zlec(), teraz))
+    return znalezione
+
+# pula gotowych liczb pierwszych w pliku tekstowym, jedna linijka "bity liczba"
+# dostep z kilku procesow naraz pilnuje blokada na osobnym pliku .lock (sama pula jest
+# podmieniana przez os.replace, wiec blokada na niej by nie dzialala); blokade zwalnia
+# system przy zamknieciu pliku, takze gdy proces zostanie zabity
+# fcntl jest tylko na Linuksie i macOS, na Windowsie blokujemy pierwszy bajt przez msvcrt,
+# a importy sa tutaj, zeby skrypt bez puli dzialal na obu systemach
+@contextlib.contextmanager
+def blokada_pliku(sciezka):
+    with open(sciezka + '.lock', 'a+b') as plik_blokady:
+        if os.name == 'nt':
+            import msvcrt
+            plik_blokady.seek(0)
+            # LK_LOCK poddaje sie po ok. 10 probach, wiec czekamy w petli
+            while True:
+                try:
+                    msvcrt.locking(plik_blokady.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                plik_blokady.seek(0)
+                msvcrt.locking(plik_blokady.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(plik_blokady.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(plik_blokady.fileno(), fcntl.LOCK_UN)
+
+# pula i plik klucza zawieraja tajne liczby (czynniki n, wykladnik d), wiec tworzymy je
+# z prawami tylko dla wlasciciela; fchmod poprawia tez prawa pliku utworzonego wczesniej
+def otworz_prywatny(sciezka, tryb):
+    flagi = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if tryb == 'a' else os.O_TRUNC)
+    deskryptor = os.open(sciezka, flagi, 0o600)
+    if hasattr(os, 'fchmod'):
+        os.fchmod(deskryptor, 0o600)
+    return os.fdopen(deskryptor, tryb)
+
+def wczytaj_pule(sciezka):
+    if not os.path.exists(sciezka):
+        return []
+    with open(sciezka) as f:
+        return [tuple(int(x) for x in linia.split()) for linia in f if linia.strip()]
+
+def dodaj_do_puli(sciezka, bity, liczby):
+    with blokada_pliku(sciezka):
+        with otworz_prywatny(sciezka, 'a') as f:
+            for liczba in liczby:
+                f.write(f"{bity} {liczba}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+# pobiera z puli ile liczb o danym rozmiarze i od razu je z niej usuwa,
+# zeby zadna liczba pierwsza nie zostala uzyta w dwoch kluczach
+def pobierz_z_puli(sciezka, bity, ile):
+    with blokada_pliku(sciezka):
+        wpisy = wczytaj_pule(sciezka)
+        pobrane = []
+        pozostale = []
+        for wpis in wpisy:
+            if wpis[0] == bity and len(pobrane) < ile:
+                pobrane.append(wpis[1])
+            else:
+                pozostale.append(wpis)
+        if pobrane:
+            # zapis do pliku tymczasowego i podmiana, zeby przerwanie nie zostawilo polowy puli
+            tymczasowy = sciezka + '.tmp'
+            with otworz_prywatny(tymczasowy, 'w') as f:
+                for b, liczba in pozostale:
+                    f.write(f"{b} {liczba}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tymczasowy, sciezka)
+    return pobrane
+
+# dopelnia pule do ile liczb o danym rozmiarze, dopisujac je partiami,
+# wiec generowanie kluczy moze z niej korzystac zanim skonczy
+def wypelnij_pule(sciezka, bity, ile, procesy=None):
+    procesy = procesy or liczba_rdzeni()
+    while True:
+        with blokada_pliku(sciezka):
+            brakuje = ile - sum(1 for b, _ in wczytaj_pule(sciezka) if b == bity)
+        if brakuje <= 0:
+            return
+        dodaj_do_puli(sciezka, bity, generuj_pierwsze_rownolegle(bity, min(brakuje, procesy), procesy))
+
 # obliczenie nwd za pomoca algorytmu euklidesa
 def nwd(a, b):
     while b > 0:
@@ -46,9 +198,12 @@ def odw_modulo(e, phi):
     else:
         return x % phi
 
-def generuj_klucze(bity):
-    p = generuj_pierwsze(bity)
-    q = generuj_pierwsze(bity)
+# p i q bierzemy najpierw z puli (jesli podana), a brakujace szukamy rownolegle
+def generuj_klucze(bity, pula=None, procesy=None):
+    pierwsze = pobierz_z_puli(pula, bity, 2) if pula else []
+    if len(pierwsze) < 2:
+        pierwsze += generuj_pierwsze_rownolegle(bity, 2 - len(pierwsze), procesy)
+    p, q = pierwsze
     # na wypadek jakby p i q wygenerowaly sie identyczne
     while p == q:
         q = generuj_pierwsze(bity)
@@ -99,144 +254,1107 @@ def dane_idat(chunki):
 
 # szyfrujemy kazdy blok po kolei i dodajemy do listy zaszyfrowanych
 # c = (m ^ e) mod n
-def szyfrowanie_rsa_ecb(bloki, e, n):
+def szyfrowanie_rsa_ecb(bloki, e, n, postep=None):
     zaszyfrowane = []
-    for blok in bloki:
+    for i, blok in enumerate(bloki):
         m = bytes_to_int(blok)
         c = pow(m, e, n)
         # zamiana spowrotem na bajty
         # każdy blok zapiszemy za pomoca tylu bajtów ile wymaga klucz
         # jeśli c zajmuje mniej bajtów niż wymaga to dopisane są zera od przodu
         zaszyfrowane.append(c.to_bytes((n.bit_length() + 7) // 8, byteorder='big'))
+        if postep:
+            postep(i + 1)
     return zaszyfrowane
 
-def odszyfrowanie_rsa_ecb(zaszyfrowane_bloki, d, n, rozmiar_bloku):
+# dlugosc to rozmiar danych przed szyfrowaniem; jesli ostatni blok byl krotszy,
+# to jego m ma mniej bajtow i trzeba go odtworzyc na tylu bajtach ile mial
+def rozmiar_ostatniego_bloku(liczba_blokow, rozmiar_bloku, dlugosc):
+    if dlugosc is None:
+        return rozmiar_bloku
+    rozmiar = dlugosc - (liczba_blokow - 1) * rozmiar_bloku
+    if not 0 < rozmiar <= rozmiar_bloku:
+        raise ValueError("Długość danych nie pasuje do liczby bloków szyfrogramu")
+    return rozmiar
+
+def odszyfrowanie_rsa_ecb(zaszyfrowane_bloki, d, n, rozmiar_bloku, postep=None, dlugosc=None):
     odszyfrowane = []
-    for c_bytes in zaszyfrowane_bloki:
+    ostatni = len(zaszyfrowane_bloki) - 1
+    rozmiar_ostatniego = rozmiar_ostatniego_bloku(len(zaszyfrowane_bloki), rozmiar_bloku, dlugosc)
+    for i, c_bytes in enumerate(zaszyfrowane_bloki):
         c = int.from_bytes(c_bytes, byteorder='big')
         m = pow(c, d, n)
-        odszyfrowane.append(m.to_bytes(rozmiar_bloku, byteorder='big'))
+        odszyfrowane.append(m.to_bytes(rozmiar_ostatniego if i == ostatni else rozmiar_bloku, byteorder='big'))
+        if postep:
+            postep(i + 1)
     return odszyfrowane
 
-def zapisz_obraz(chunki, nowe_idat, sciezka_wy):
+# zapis jednego chunka, crc liczymy jesli nie jest podane
+def zapisz_chunk(f, typ, dane, crc=None):
+    if crc is None:
+        crc = zlib.crc32(typ.encode("utf-8") + dane).to_bytes(4, "big")
+    f.write(len(dane).to_bytes(4, "big"))
+    f.write(typ.encode("utf-8"))
+    f.write(dane)
+    f.write(crc)
+
+# dodatkowe_chunki to lista (typ, dane) wstawiana przed IEND, stary chunk tego typu jest pomijany
+# stary chunk ze skrotem opisuje inne dane niz nowe IDAT, wiec nie jest przepisywany nigdy
+# (tak samo jak w zapisz_obraz_strumieniowo)
+def zapisz_obraz(chunki, nowe_idat, sciezka_wy, dodatkowe_chunki=()):
     nowe_chunki = []
     idat_done = False
+    pomijane = {TYP_SKROTU} | {typ for typ, _ in dodatkowe_chunki}
     for typ, dane, crc in chunki:
         if typ == "IDAT" and not idat_done:
             # Nowy CRC
             new_crc = zlib.crc32(b'IDAT' + nowe_idat).to_bytes(4, 'big')
             nowe_chunki.append(("IDAT", nowe_idat, new_crc))
             idat_done = True
-        elif typ != "IDAT":
+        elif typ == "IEND":
+            for typ_dodatkowy, dane_dodatkowe in dodatkowe_chunki:
+                crc_dodatkowy = zlib.crc32(typ_dodatkowy.encode("utf-8") + dane_dodatkowe).to_bytes(4, 'big')
+                nowe_chunki.append((typ_dodatkowy, dane_dodatkowe, crc_dodatkowy))
+            nowe_chunki.append((typ, dane, crc))
+        elif typ != "IDAT" and typ not in pomijane:
             nowe_chunki.append((typ, dane, crc))
     with open(sciezka_wy, "wb") as f:
         f.write(b'\x89PNG\r\n\x1a\n')
         for typ, dane, crc in nowe_chunki:
-            f.write(len(dane).to_bytes(4, "big"))
-            f.write(typ.encode("utf-8"))
-            f.write(dane)
-            f.write(crc)
+            zapisz_chunk(f, typ, dane, crc)
+
+# skrot SHA-256 danych przed szyfrowaniem zapisany w zaszyfrowanym obrazie we wlasnym chunku
+# rsSK: pomocniczy (male r), prywatny (male s), niebezpieczny do kopiowania (duze K)
+# zawartosc: dlugosc danych (8 bajtow), rozmiar bloku (2 bajty), skrot (32 bajty)
+TYP_SKROTU = 'rsSK'
+
+def chunk_skrotu(skrot, dlugosc, rozmiar_bloku):
+    return TYP_SKROTU, dlugosc.to_bytes(8, 'big') + rozmiar_bloku.to_bytes(2, 'big') + skrot
+
+def odczytaj_skrot(chunki):
+    for typ, dane, _ in chunki:
+        if typ == TYP_SKROTU:
+            return int.from_bytes(dane[:8], 'big'), int.from_bytes(dane[8:10], 'big'), dane[10:]
+    return None
+
+# przepuszcza strumien dalej, po drodze liczac jego skrot
+def licz_skrot(kawalki, skrot):
+    for kawalek in kawalki:
+        skrot.update(kawalek)
+        yield kawalek
 
 def polacz_bloki(bloki):
     return b''.join(bloki)
 
-def szyfrowanie_rsa_cbc(bloki, e, n, rozmiar_bloku):
+# rownolegla kompresja deflate w stylu pigz
+# dane dzielimy na segmenty, kazdy kompresujemy osobno w watku (zlib zwalnia GIL),
+# jako slownik dajemy mu ostatnie 32 KiB poprzedniego segmentu, zeby kompresja nie spadla,
+# a segment konczymy pelnym flushem, wiec surowe strumienie deflate mozna po prostu skleic
+ROZMIAR_SEGMENTU = 128 * 1024
+ROZMIAR_SLOWNIKA = 32 * 1024
+
+# sumy Adler-32 dwoch kawalkow mozna polaczyc bez liczenia od nowa (jak adler32_combine z zlib)
+def adler32_polacz(adler1, adler2, dlugosc2):
+    baza = 65521
+    a1, b1 = adler1 & 0xffff, adler1 >> 16
+    a2, b2 = adler2 & 0xffff, adler2 >> 16
+    a = (a1 + a2 - 1) % baza
+    b = (b1 + b2 + dlugosc2 * (a1 - 1)) % baza
+    return (b << 16) | a
+
+def kompresuj_segment(segment, slownik, ostatni, poziom):
+    if slownik:
+        kompresor = zlib.compressobj(poziom, zlib.DEFLATED, -15, zdict=slownik)
+    else:
+        kompresor = zlib.compressobj(poziom, zlib.DEFLATED, -15)
+    skompresowane = kompresor.compress(segment)
+    skompresowane += kompresor.flush(zlib.Z_FINISH if ostatni else zlib.Z_FULL_FLUSH)
+    return skompresowane, zlib.adler32(segment)
+
+def kompresuj_rownolegle(dane, poziom=6, watki=None, rozmiar_segmentu=ROZMIAR_SEGMENTU):
+    if len(dane) <= rozmiar_segmentu:
+        return zlib.compress(dane, poziom)
+
+    widok = memoryview(dane)
+    poczatki = range(0, len(dane), rozmiar_segmentu)
+    with ThreadPoolExecutor(watki or liczba_rdzeni()) as wykonawca:
+        zadania = [
+            wykonawca.submit(
+                kompresuj_segment,
+                widok[i:i + rozmiar_segmentu],
+                bytes(widok[max(0, i - ROZMIAR_SLOWNIKA):i]),
+                i + rozmiar_segmentu >= len(dane),
+                poziom,
+            )
+            for i in poczatki
+        ]
+        wyniki = [zadanie.result() for zadanie in zadania]
+
+    # naglowek zlib taki sam jak przy zwyklym zlib.compress z tym poziomem
+    wynik = bytearray(zlib.compress(b'', poziom)[:2])
+    adler = 1
+    for i, (skompresowane, adler_segmentu) in zip(poczatki, wyniki):
+        wynik += skompresowane
+        adler = adler32_polacz(adler, adler_segmentu, min(rozmiar_segmentu, len(dane) - i))
+    wynik += adler.to_bytes(4, 'big')
+    return bytes(wynik)
+
+# CBC liczone na intach zamiast bajt po bajcie
+# poprzedni blok szyfrogramu trzymamy jako int z pierwszych rozmiar_bloku bajtow c,
+# czyli c przesuniete w prawo o nadmiarowe bajty, wiec xor robimy jednym ^ na calym bloku
+# iv mozna podac, zeby kontynuowac lancuch od zapisanego stanu
+def szyfrowanie_rsa_cbc(bloki, e, n, rozmiar_bloku, postep=None, iv=None):
     zaszyfrowane = []
-    iv = os.urandom(rozmiar_bloku)  # Wektor inicjalizujący
-    poprzedni = iv
+    if iv is None:
+        iv = os.urandom(rozmiar_bloku)  # Wektor inicjalizujący
+    rozmiar_szyfrogramu = (n.bit_length() + 7) // 8
+    przesuniecie = 8 * (rozmiar_szyfrogramu - rozmiar_bloku)
+    poprzedni = int.from_bytes(iv, byteorder='big')
 
-    for blok in bloki:
-        xor_blok = bytes(a ^ b for a, b in zip(blok, poprzedni))
-        m = bytes_to_int(xor_blok)
+    for i, blok in enumerate(bloki):
+        # ostatni blok moze byc krotszy, wtedy bierzemy tylko pierwsze len(blok) bajtow poprzedniego
+        m = int.from_bytes(blok, byteorder='big') ^ (poprzedni >> (8 * (rozmiar_bloku - len(blok))))
         c = pow(m, e, n)
-        c_bytes = c.to_bytes((n.bit_length() + 7) // 8, byteorder='big')
-        zaszyfrowane.append(c_bytes)
-        poprzedni = c_bytes[:rozmiar_bloku]  # tylko tyle bajtów ile ma blok
+        zaszyfrowane.append(c.to_bytes(rozmiar_szyfrogramu, byteorder='big'))
+        poprzedni = c >> przesuniecie  # tylko tyle bajtów ile ma blok
+        if postep:
+            postep(i + 1)
 
     return iv, zaszyfrowane
 
-def odszyfrowanie_rsa_cbc(zaszyfrowane_bloki, d, n, rozmiar_bloku, iv):
+def odszyfrowanie_rsa_cbc(zaszyfrowane_bloki, d, n, rozmiar_bloku, iv, postep=None, dlugosc=None):
     odszyfrowane = []
-    poprzedni = iv
+    rozmiar_szyfrogramu = (n.bit_length() + 7) // 8
+    przesuniecie = 8 * (rozmiar_szyfrogramu - rozmiar_bloku)
+    poprzedni = int.from_bytes(iv, byteorder='big')
+    ostatni = len(zaszyfrowane_bloki) - 1
+    rozmiar_ostatniego = rozmiar_ostatniego_bloku(len(zaszyfrowane_bloki), rozmiar_bloku, dlugosc)
 
-    for c_bytes in zaszyfrowane_bloki:
+    for i, c_bytes in enumerate(zaszyfrowane_bloki):
         c = int.from_bytes(c_bytes, byteorder='big')
         m = pow(c, d, n)
-        m_bytes = m.to_bytes(rozmiar_bloku, byteorder='big')
-        blok = bytes(a ^ b for a, b in zip(m_bytes, poprzedni))
-        odszyfrowane.append(blok)
-        poprzedni = c_bytes[:rozmiar_bloku]
+        if i == ostatni and rozmiar_ostatniego != rozmiar_bloku:
+            # przy szyfrowaniu krotki blok byl xorowany tylko z pierwszymi bajtami poprzedniego
+            poprzedni >>= 8 * (rozmiar_bloku - rozmiar_ostatniego)
+            odszyfrowane.append((m ^ poprzedni).to_bytes(rozmiar_ostatniego, byteorder='big'))
+        else:
+            odszyfrowane.append((m ^ poprzedni).to_bytes(rozmiar_bloku, byteorder='big'))
+        # c_bytes ma zawsze rozmiar_szyfrogramu bajtow, wiec przesuniecie daje jego pierwsze bajty
+        poprzedni = c >> przesuniecie
+        if postep:
+            postep(i + 1)
 
     return odszyfrowane
 
+# raportowanie postepu dlugich petli po blokach na stderr
+# tryb 'tekst' wypisuje czytelna linijke, 'json' jedna linijke JSON na raport, 'brak' nic
+# zegar sprawdzamy tylko co co_ile blokow, a wypisujemy najwyzej raz na odstep sekund,
+# wiec narzut przy modexp jest pomijalny
+# pominiete to bloki wczytane z checkpointu, nie licza sie do predkosci
+def utworz_postep(etap, wszystkie, rozmiar_bloku, tryb='tekst', co_ile=16, odstep=1.0, pominiete=0):
+    if tryb == 'brak' or wszystkie == 0:
+        return None
+    start = time.perf_counter()
+    ostatni_raport = start
+
+    def postep(zrobione):
+        nonlocal ostatni_raport
+        if zrobione % co_ile and zrobione != wszystkie:
+            return
+        teraz = time.perf_counter()
+        if teraz - ostatni_raport < odstep and zrobione != wszystkie:
+            return
+        ostatni_raport = teraz
+        czas = max(teraz - start, 1e-9)
+        bloki_na_s = max(zrobione - pominiete, 1) / czas
+        mb_na_s = bloki_na_s * rozmiar_bloku / 1e6
+        eta = (wszystkie - zrobione) / bloki_na_s
+        if tryb == 'json':
+            print(json.dumps({'etap': etap, 'bloki': zrobione, 'wszystkie': wszystkie,
+                              'bloki_na_s': round(bloki_na_s, 2), 'mb_na_s': round(mb_na_s, 4),
+                              'eta_s': round(eta, 1)}), file=sys.stderr, flush=True)
+        else:
+            print(f"[{etap}] {zrobione}/{wszystkie} bloków ({100 * zrobione // wszystkie}%), "
+                  f"{bloki_na_s:.1f} bloków/s, {mb_na_s:.3f} MB/s, ETA {eta:.0f} s",
+                  file=sys.stderr, flush=True)
+
+    return postep
+
+# wyciaganie opcji --nazwa wartosc z listy argumentow
+def wyciagnij_opcje(argumenty, nazwa, domyslna=None):
+    if nazwa not in argumenty:
+        return domyslna
+    i = argumenty.index(nazwa)
+    if i + 1 >= len(argumenty):
+        raise ValueError(f"Brak wartości dla opcji {nazwa}")
+    wartosc = argumenty[i + 1]
+    del argumenty[i:i + 2]
+    return wartosc
 
+def wyciagnij_flage(argumenty, nazwa):
+    if nazwa not in argumenty:
+        return False
+    argumenty.remove(nazwa)
+    return True
+
+# zapis i odczyt klucza, zeby kilka procesow / maszyn moglo uzyc tego samego klucza
+# bez d zapisywany jest sam klucz publiczny - wystarczy on wezlom, ktore tylko szyfruja
+def zapisz_klucz(sciezka, n, e, d=None):
+    klucz = {'n': n, 'e': e}
+    if d is not None:
+        klucz['d'] = d
+    with otworz_prywatny(sciezka, 'w') as f:
+        json.dump(klucz, f)
+
+def wczytaj_klucz_publiczny(sciezka):
+    with open(sciezka) as f:
+        klucz = json.load(f)
+    return klucz['n'], klucz['e']
+
+def wczytaj_klucz(sciezka):
+    with open(sciezka) as f:
+        klucz = json.load(f)
+    if 'd' not in klucz:
+        raise ValueError(f"Plik {sciezka} zawiera tylko klucz publiczny, potrzebny jest klucz z d")
+    return klucz['n'], klucz['e'], klucz['d']
+
+# odcisk klucza publicznego, zeby sprawdzic czy wszystkie shardy zaszyfrowano tym samym kluczem
+def odcisk_klucza(n, e):
+    return hashlib.sha256(f"{n}:{e}".encode('utf-8')).hexdigest()
+
+# chunki bez danych IDAT (z pustym znacznikiem, jak z przeglad_chunkow) zapisywane w JSON
+def chunki_do_json(chunki):
+    return [[typ, dane.hex(), crc.hex()] for typ, dane, crc in chunki]
+
+def chunki_z_json(lista):
+    return [(typ, bytes.fromhex(dane), bytes.fromhex(crc)) for typ, dane, crc in lista]
+
+# podzial rozpakowanych danych IDAT na shardy do szyfrowania na osobnych maszynach
+# kazdy shard zawiera pelne bloki (oprocz ostatniego), wiec po zaszyfrowaniu
+# wystarczy skleic wyniki po kolei i wychodzi to samo co z szyfrowanie_rsa_ecb
+# manifest zawiera chunki obrazu (bez IDAT), odcisk klucza i oczekiwane dlugosci szyfrogramow,
+# wiec merge moze dzialac na innej maszynie i wykryc shard zaszyfrowany innym kluczem
+def podziel_na_shardy(sciezka, liczba_shardow, katalog, rozmiar_bloku, sciezka_klucza):
+    if liczba_shardow < 1:
+        raise ValueError("Liczba shardów musi być co najmniej 1")
+    n, e = wczytaj_klucz_publiczny(sciezka_klucza)
+    if rozmiar_bloku * 8 >= n.bit_length():
+        raise ValueError("Blok jest za duży dla tego klucza")
+    rozmiar_szyfrogramu = (n.bit_length() + 7) // 8
+    rozpakowane = zlib.decompress(dane_idat(parse_chunks(wczytaj_bajty(sciezka))))
+    liczba_blokow = (len(rozpakowane) + rozmiar_bloku - 1) // rozmiar_bloku
+    blokow_na_shard = max(1, (liczba_blokow + liczba_shardow - 1) // liczba_shardow)
+    rozmiar_sharda = blokow_na_shard * rozmiar_bloku
+
+    os.makedirs(katalog, exist_ok=True)
+    shardy = []
+    for i, poczatek in enumerate(range(0, len(rozpakowane), rozmiar_sharda)):
+        dane = rozpakowane[poczatek:poczatek + rozmiar_sharda]
+        plik = f"shard_{i:03d}.bin"
+        with open(os.path.join(katalog, plik), 'wb') as f:
+            f.write(dane)
+        liczba_blokow_sharda = (len(dane) + rozmiar_bloku - 1) // rozmiar_bloku
+        shardy.append({'plik': plik, 'poczatek': poczatek, 'dlugosc': len(dane),
+                       'dlugosc_szyfrogramu': liczba_blokow_sharda * rozmiar_szyfrogramu,
+                       'sha256': hashlib.sha256(dane).hexdigest()})
+
+    manifest = {
+        'chunki': chunki_do_json(przeglad_chunkow(sciezka)[0]),
+        'tryb': 'ecb',
+        'rozmiar_bloku': rozmiar_bloku,
+        'dlugosc': len(rozpakowane),
+        'klucz': odcisk_klucza(n, e),
+        'dane_sha256': hashlib.sha256(rozpakowane).hexdigest(),
+        'shardy': shardy,
+    }
+    sciezka_manifestu = os.path.join(katalog, 'manifest.json')
+    with open(sciezka_manifestu, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return sciezka_manifestu
+
+def wczytaj_manifest(sciezka_manifestu):
+    with open(sciezka_manifestu) as f:
+        return json.load(f)
+
+# szyfrowanie jednego sharda - to robi pojedynczy wezel, wystarczy mu klucz publiczny
+# wynik trafia do shard_XXX.bin.enc, a jego suma kontrolna i odcisk klucza do shard_XXX.bin.enc.json
+def szyfruj_shard(sciezka_manifestu, indeks, sciezka_klucza, tryb_postepu='brak'):
+    manifest = wczytaj_manifest(sciezka_manifestu)
+    katalog = os.path.dirname(os.path.abspath(sciezka_manifestu))
+    if not 0 <= indeks < len(manifest['shardy']):
+        raise ValueError(f"Numer sharda musi być od 0 do {len(manifest['shardy']) - 1}")
+    shard = manifest['shardy'][indeks]
+    n, e = wczytaj_klucz_publiczny(sciezka_klucza)
+    if odcisk_klucza(n, e) != manifest['klucz']:
+        raise ValueError("Klucz nie pasuje do klucza zapisanego w manifeście")
+    rozmiar_bloku = manifest['rozmiar_bloku']
+
+    dane = wczytaj_bajty(os.path.join(katalog, shard['plik']))
+    if hashlib.sha256(dane).hexdigest() != shard['sha256']:
+        raise ValueError(f"Suma kontrolna sharda {shard['plik']} się nie zgadza")
+
+    bloki = [dane[i:i + rozmiar_bloku] for i in range(0, len(dane), rozmiar_bloku)]
+    postep = utworz_postep(f"shard {indeks}", len(bloki), rozmiar_bloku, tryb_postepu)
+    zaszyfrowane = polacz_bloki(szyfrowanie_rsa_ecb(bloki, e, n, postep))
+
+    sciezka_wy = os.path.join(katalog, shard['plik'] + '.enc')
+    with open(sciezka_wy, 'wb') as f:
+        f.write(zaszyfrowane)
+    with open(sciezka_wy + '.json', 'w') as f:
+        json.dump({'sha256': hashlib.sha256(zaszyfrowane).hexdigest(), 'klucz': odcisk_klucza(n, e)}, f)
+    return sciezka_wy
+
+# sklejenie zaszyfrowanych shardow w jeden obraz przez zapisz_obraz
+def scal_shardy(sciezka_manifestu, sciezka_wy):
+    manifest = wczytaj_manifest(sciezka_manifestu)
+    katalog = os.path.dirname(os.path.abspath(sciezka_manifestu))
+
+    zaszyfrowane = []
+    for shard in manifest['shardy']:
+        plik = os.path.join(katalog, shard['plik'] + '.enc')
+        if not os.path.exists(plik):
+            raise ValueError(f"Brak zaszyfrowanego sharda {shard['plik']}")
+        if not os.path.exists(plik + '.json'):
+            raise ValueError(f"Brak opisu zaszyfrowanego sharda {shard['plik']} ({shard['plik']}.enc.json)")
+        dane = wczytaj_bajty(plik)
+        with open(plik + '.json') as f:
+            opis = json.load(f)
+        if hashlib.sha256(dane).hexdigest() != opis['sha256']:
+            raise ValueError(f"Suma kontrolna zaszyfrowanego sharda {shard['plik']} się nie zgadza")
+        if opis['klucz'] != manifest['klucz']:
+            raise ValueError(f"Shard {shard['plik']} zaszyfrowano innym kluczem niż w manifeście")
+        if len(dane) != shard['dlugosc_szyfrogramu']:
+            raise ValueError(f"Zaszyfrowany shard {shard['plik']} ma {len(dane)} bajtów, "
+                             f"oczekiwano {shard['dlugosc_szyfrogramu']}")
+        zaszyfrowane.append(dane)
+
+    # chunk ze skrotem pozwala potem odszyfrowac i sprawdzic obraz poleceniem deszyfruj
+    chunki = chunki_z_json(manifest['chunki'])
+    skrot = chunk_skrotu(bytes.fromhex(manifest['dane_sha256']), manifest['dlugosc'], manifest['rozmiar_bloku'])
+    zapisz_obraz(chunki, kompresuj_rownolegle(polacz_bloki(zaszyfrowane)), sciezka_wy, [skrot])
+
+# szyfrowanie z checkpointami, zeby przerwany dlugi przebieg nie tracil policzonych modexp
+# plik checkpointu jest tylko dopisywany: najpierw linijka JSON z parametrami (dla CBC z iv),
+# potem rekordy [indeks pierwszego bloku, liczba blokow, szyfrogramy, crc32 rekordu]
+# dla CBC stanem lancucha jest poczatek ostatniego szyfrogramu, wiec jest zapisany w rekordzie
+def wczytaj_checkpoint(sciezka, naglowek, rozmiar_szyfrogramu):
+    if not os.path.exists(sciezka):
+        return None, []
+    with open(sciezka, 'rb') as f:
+        try:
+            zapisany = json.loads(f.readline())
+        except ValueError:
+            # przerwany zapis naglowka, zaczynamy od nowa
+            return None, []
+        dane = f.read()
+        poczatek_rekordow = f.tell() - len(dane)
+    if {k: v for k, v in zapisany.items() if k != 'iv'} != {k: v for k, v in naglowek.items() if k != 'iv'}:
+        raise ValueError(f"Checkpoint {sciezka} pochodzi z innego przebiegu")
+
+    zaszyfrowane = []
+    pozycja = 0
+    while pozycja + 8 <= len(dane):
+        indeks = int.from_bytes(dane[pozycja:pozycja + 4], 'big')
+        liczba = int.from_bytes(dane[pozycja + 4:pozycja + 8], 'big')
+        koniec = pozycja + 8 + liczba * rozmiar_szyfrogramu
+        # niepelny albo uszkodzony ostatni rekord (przerwany zapis) pomijamy
+        if koniec + 4 > len(dane) or indeks != len(zaszyfrowane):
+            break
+        if zlib.crc32(dane[pozycja:koniec]).to_bytes(4, 'big') != dane[koniec:koniec + 4]:
+            break
+        zaszyfrowane += [dane[i:i + rozmiar_szyfrogramu] for i in range(pozycja + 8, koniec, rozmiar_szyfrogramu)]
+        pozycja = koniec + 4
+
+    # ucinamy smieci po ostatnim dobrym rekordzie, zeby dalej dopisywac od czystego miejsca
+    with open(sciezka, 'r+b') as f:
+        f.truncate(poczatek_rekordow + pozycja)
+    return bytes.fromhex(zapisany['iv']) if zapisany.get('iv') else None, zaszyfrowane
+
+def szyfrowanie_z_checkpointem(bloki, e, n, rozmiar_bloku, tryb, sciezka, wznow,
+                               skrot_danych, co_ile=64, tryb_postepu='brak'):
+    rozmiar_szyfrogramu = (n.bit_length() + 7) // 8
+    naglowek = {'tryb': tryb, 'n': n, 'e': e, 'rozmiar_bloku': rozmiar_bloku,
+                'liczba_blokow': len(bloki), 'dane_sha256': skrot_danych}
+
+    if not wznow and os.path.exists(sciezka):
+        raise ValueError(f"Checkpoint {sciezka} już istnieje, użyj wznawiania zamiast go nadpisywać")
+    iv, zaszyfrowane = wczytaj_checkpoint(sciezka, naglowek, rozmiar_szyfrogramu) if wznow else (None, [])
+    if iv is None and not zaszyfrowane:
+        iv = os.urandom(rozmiar_bloku) if tryb == 'cbc' else None
+        with open(sciezka, 'wb') as f:
+            naglowek['iv'] = iv.hex() if iv else None
+            f.write(json.dumps(naglowek).encode('utf-8') + b'\n')
+    elif zaszyfrowane:
+        print(f"Wznowiono {tryb.upper()} od bloku {len(zaszyfrowane)} z {len(bloki)}")
+
+    postep = utworz_postep(f"{tryb.upper()} szyfrowanie", len(bloki), rozmiar_bloku, tryb_postepu,
+                           pominiete=len(zaszyfrowane))
+    with open(sciezka, 'ab') as f:
+        for poczatek in range(len(zaszyfrowane), len(bloki), co_ile):
+            partia = bloki[poczatek:poczatek + co_ile]
+            postep_partii = (lambda zrobione, p=poczatek: postep(p + zrobione)) if postep else None
+            if tryb == 'cbc':
+                # poczatek poprzedniego szyfrogramu dziala dla reszty lancucha jak iv
+                poprzedni = zaszyfrowane[-1][:rozmiar_bloku] if zaszyfrowane else iv
+                _, nowe = szyfrowanie_rsa_cbc(partia, e, n, rozmiar_bloku, postep_partii, iv=poprzedni)
+            else:
+                nowe = szyfrowanie_rsa_ecb(partia, e, n, postep_partii)
+            rekord = poczatek.to_bytes(4, 'big') + len(nowe).to_bytes(4, 'big') + polacz_bloki(nowe)
+            f.write(rekord + zlib.crc32(rekord).to_bytes(4, 'big'))
+            f.flush()
+            os.fsync(f.fileno())
+            zaszyfrowane += nowe
+
+    return iv, zaszyfrowane
+
+# pomiar pamieci przez tracemalloc (wlaczany opcja --pamiec)
+# wypisuje szczyt zajetej pamieci od poprzedniego raportu, czyli szczyt danego etapu
+def raport_pamieci(etap):
+    if not tracemalloc.is_tracing():
+        return
+    biezaca, szczyt = tracemalloc.get_traced_memory()
+    print(f"[pamięć] {etap}: szczyt {szczyt / 2 ** 20:.1f} MiB, po etapie {biezaca / 2 ** 20:.1f} MiB",
+          file=sys.stderr, flush=True)
+    tracemalloc.reset_peak()
+
+# rozmiar podany jako liczba bajtow albo z przyrostkiem K, M, G (np. 512M)
+def parsuj_rozmiar(tekst):
+    mnozniki = {'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30}
+    tekst = tekst.strip().upper().rstrip('B')
+    if tekst and tekst[-1] in mnozniki:
+        return int(float(tekst[:-1]) * mnozniki[tekst[-1]])
+    return int(tekst)
+
+# przeglad pliku chunk po chunku bez wczytywania danych IDAT (przeskakujemy je seekiem)
+# w miejscu pierwszego IDAT zostaje pusty znacznik, zeby zapisz_obraz wiedzial gdzie wstawic nowe dane
+def przeglad_chunkow(sciezka):
+    chunki = []
+    rozmiar_idat = 0
+    with open(sciezka, 'rb') as f:
+        f.seek(8)
+        while True:
+            naglowek = f.read(8)
+            if len(naglowek) < 8:
+                break
+            dlugosc = int.from_bytes(naglowek[:4], 'big')
+            typ = naglowek[4:8].decode('utf-8')
+            if typ == 'IDAT':
+                if not rozmiar_idat:
+                    chunki.append(('IDAT', b'', b''))
+                rozmiar_idat += dlugosc
+                f.seek(dlugosc + 4, os.SEEK_CUR)
+            else:
+                dane = f.read(dlugosc)
+                chunki.append((typ, dane, f.read(4)))
+    return chunki, rozmiar_idat
+
+# dane wszystkich chunkow IDAT czytane kawalkami prosto z pliku
+def czytaj_idat_strumieniowo(sciezka, rozmiar_kawalka=64 * 1024):
+    with open(sciezka, 'rb') as f:
+        f.seek(8)
+        while True:
+            naglowek = f.read(8)
+            if len(naglowek) < 8:
+                break
+            dlugosc = int.from_bytes(naglowek[:4], 'big')
+            if naglowek[4:8] != b'IDAT':
+                f.seek(dlugosc + 4, os.SEEK_CUR)
+                continue
+            while dlugosc > 0:
+                kawalek = f.read(min(rozmiar_kawalka, dlugosc))
+                dlugosc -= len(kawalek)
+                yield kawalek
+            f.seek(4, os.SEEK_CUR)
+
+# rozmiar danych po dekompresji liczony z IHDR: kazdy wiersz to bajt filtra + piksele
+# przy przeplocie Adam7 liczymy osobno kazde z 7 przejsc
+def rozmiar_rozpakowanych(ihdr):
+    szerokosc = int.from_bytes(ihdr[0:4], 'big')
+    wysokosc = int.from_bytes(ihdr[4:8], 'big')
+    glebia, typ_koloru, przeplot = ihdr[8], ihdr[9], ihdr[12]
+    kanaly = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[typ_koloru]
+
+    def rozmiar_obrazu(szer, wys):
+        if szer == 0 or wys == 0:
+            return 0
+        return wys * (1 + (szer * kanaly * glebia + 7) // 8)
+
+    if not przeplot:
+        return rozmiar_obrazu(szerokosc, wysokosc)
+    przejscia = [(0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2)]
+    return sum(rozmiar_obrazu((szerokosc - x0 + dx - 1) // dx, (wysokosc - y0 + dy - 1) // dy)
+               for x0, y0, dx, dy in przejscia)
+
+# szacunek szczytu pamieci zwyklego (wsadowego) przebiegu main
+# bajty obiektu bytes w liscie blokow: dane + naglowek obiektu + wskaznik w liscie
+NARZUT_BLOKU = 33 + 8
+# pamiec niezalezna od rozmiaru obrazu: bufory zlib w watkach kompresji, pula watkow, klucz itp.
+NARZUT_STALY = 4 * 2 ** 20
+
+# prawdziwy szyfrogram sie nie kompresuje, wiec zaszyfrowany IDAT liczymy jak dane szyfrogramu
+def oszacuj_pamiec_wsadowa(rozmiar_pliku, rozmiar_idat, rozmiar_danych, rozmiar_bloku, rozmiar_szyfrogramu):
+    liczba_blokow = (rozmiar_danych + rozmiar_bloku - 1) // rozmiar_bloku
+    dane_szyfrogramu = liczba_blokow * rozmiar_szyfrogramu
+    lista_szyfrogramow = dane_szyfrogramu + liczba_blokow * NARZUT_BLOKU
+    # stale przez caly przebieg: chunki (kopia pliku) i lista blokow
+    stale = rozmiar_pliku + liczba_blokow * (rozmiar_bloku + NARZUT_BLOKU)
+    # szyfrowanie CBC: lista szyfrogramow, ich polaczenie i kopia z iv, a pod koniec kompresuj_rownolegle
+    # naraz wyniki segmentow, bytearray (z zapasem do 1/8) i koncowa kopia bytes
+    szyfrowanie = lista_szyfrogramow + 5 * dane_szyfrogramu + dane_szyfrogramu // 8
+    # deszyfrowanie CBC: chunki wczytanego obrazu, sklejony IDAT, rozpakowany szyfrogram i jego kopia
+    # bez iv, lista blokow szyfrogramu, odszyfrowane bloki, ich polaczenie i kompresja wyniku
+    # (trzy kopie mniej wiecej wielkosci IDAT oryginalu)
+    deszyfrowanie = (4 * dane_szyfrogramu + lista_szyfrogramow + liczba_blokow * (rozmiar_bloku + NARZUT_BLOKU)
+                     + rozmiar_danych + 3 * rozmiar_idat)
+    return NARZUT_STALY + stale + max(szyfrowanie, deszyfrowanie)
+
+# w trybie strumieniowym w pamieci jest tylko jedna partia blokow i bufory zlib,
+# wiec szukamy najwiekszej partii ktora sie zmiesci (nie wiecej niz MAKS_PARTIA)
+STALA_STRUMIENIOWA = 4 * 2 ** 20
+MAKS_PARTIA = 4096
+
+def dobierz_partie(limit, rozmiar_bloku, rozmiar_szyfrogramu):
+    # partia jest naraz jako bajty, lista blokow i lista wynikow, w obu kierunkach
+    koszt_bloku = 3 * (rozmiar_bloku + rozmiar_szyfrogramu + 2 * NARZUT_BLOKU)
+    return min(MAKS_PARTIA, (limit - STALA_STRUMIENIOWA) // koszt_bloku)
+
+# kawalki danych o dowolnych rozmiarach zamieniane na partie po partia blokow
+def partie_blokow(kawalki, rozmiar_bloku, partia):
+    bufor = bytearray()
+    rozmiar_partii = rozmiar_bloku * partia
+    for kawalek in kawalki:
+        bufor += kawalek
+        while len(bufor) >= rozmiar_partii:
+            dane = bytes(bufor[:rozmiar_partii])
+            del bufor[:rozmiar_partii]
+            yield [dane[i:i + rozmiar_bloku] for i in range(0, len(dane), rozmiar_bloku)]
+    if bufor:
+        yield [bytes(bufor[i:i + rozmiar_bloku]) for i in range(0, len(bufor), rozmiar_bloku)]
+
+def rozpakuj_strumieniowo(kawalki, rozmiar_kawalka=64 * 1024):
+    dekompresor = zlib.decompressobj()
+    for kawalek in kawalki:
+        dane = dekompresor.decompress(kawalek, rozmiar_kawalka)
+        while dane:
+            yield dane
+            dane = dekompresor.decompress(dekompresor.unconsumed_tail, rozmiar_kawalka)
+    reszta = dekompresor.flush()
+    if reszta:
+        yield reszta
+
+# zwraca pierwsze ile bajtow strumienia (np. iv) i generator z reszta
+def oddziel_poczatek(kawalki, ile):
+    kawalki = iter(kawalki)
+    poczatek = b''
+    for kawalek in kawalki:
+        poczatek += kawalek
+        if len(poczatek) >= ile:
+            break
+    reszta = poczatek[ile:]
+    return poczatek[:ile], itertools.chain([reszta] if reszta else [], kawalki)
+
+# skrot (jesli podany) liczymy z blokow danych po drodze, a w stan['dlugosc'] zliczamy
+# faktyczna liczbe bajtow danych, bo szacunek z IHDR nie musi sie zgadzac z IDAT
+def szyfruj_strumieniowo(partie, e, n, rozmiar_bloku, tryb, postep=None, skrot=None, stan=None):
+    zrobione = 0
+    poprzedni = None
+    if tryb == 'cbc':
+        poprzedni = os.urandom(rozmiar_bloku)
+        yield poprzedni
+    for bloki in partie:
+        if skrot:
+            for blok in bloki:
+                skrot.update(blok)
+        if stan is not None:
+            stan['dlugosc'] += sum(len(blok) for blok in bloki)
+        postep_partii = (lambda z, p=zrobione: postep(p + z)) if postep else None
+        if tryb == 'cbc':
+            _, zaszyfrowane = szyfrowanie_rsa_cbc(bloki, e, n, rozmiar_bloku, postep_partii, iv=poprzedni)
+            poprzedni = zaszyfrowane[-1][:rozmiar_bloku]
+        else:
+            zaszyfrowane = szyfrowanie_rsa_ecb(bloki, e, n, postep_partii)
+        zrobione += len(bloki)
+        yield polacz_bloki(zaszyfrowane)
+
+def odszyfruj_strumieniowo(kawalki, d, n, rozmiar_bloku, tryb, partia, dlugosc, postep=None):
+    rozmiar_szyfrogramu = (n.bit_length() + 7) // 8
+    zrobione = 0
+    poprzedni = None
+    if tryb == 'cbc':
+        poprzedni, kawalki = oddziel_poczatek(kawalki, rozmiar_bloku)
+    for bloki in partie_blokow(kawalki, rozmiar_szyfrogramu, partia):
+        postep_partii = (lambda z, p=zrobione: postep(p + z)) if postep else None
+        dlugosc_partii = min(len(bloki) * rozmiar_bloku, dlugosc - zrobione * rozmiar_bloku)
+        if tryb == 'cbc':
+            odszyfrowane = odszyfrowanie_rsa_cbc(bloki, d, n, rozmiar_bloku, poprzedni, postep_partii, dlugosc_partii)
+            poprzedni = bloki[-1][:rozmiar_bloku]
+        else:
+            odszyfrowane = odszyfrowanie_rsa_ecb(bloki, d, n, rozmiar_bloku, postep_partii, dlugosc_partii)
+        zrobione += len(bloki)
+        yield polacz_bloki(odszyfrowane)
+
+# zapis obrazu z danymi kompresowanymi na biezaco i dzielonymi na kilka chunkow IDAT
+# dodatkowe_chunki to funkcja zwracajaca liste (typ, dane) do wstawienia przed IEND,
+# wolana dopiero po zapisaniu danych, bo np. skrot znamy dopiero po przejsciu strumienia
+def zapisz_obraz_strumieniowo(chunki, kawalki, sciezka_wy, rozmiar_idat=256 * 1024, dodatkowe_chunki=None):
+    kompresor = zlib.compressobj()
+    idat_done = False
+    with open(sciezka_wy, "wb") as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        for typ, dane, crc in chunki:
+            if typ == "IDAT" and not idat_done:
+                bufor = bytearray()
+                for kawalek in kawalki:
+                    bufor += kompresor.compress(kawalek)
+                    if len(bufor) >= rozmiar_idat:
+                        zapisz_chunk(f, "IDAT", bytes(bufor))
+                        bufor.clear()
+                bufor += kompresor.flush()
+                zapisz_chunk(f, "IDAT", bytes(bufor))
+                idat_done = True
+            elif typ == "IEND":
+                for typ_dodatkowy, dane_dodatkowe in (dodatkowe_chunki() if dodatkowe_chunki else []):
+                    zapisz_chunk(f, typ_dodatkowy, dane_dodatkowe)
+                zapisz_chunk(f, typ, dane, crc)
+            elif typ != "IDAT" and typ != TYP_SKROTU:
+                zapisz_chunk(f, typ, dane, crc)
+
+# cache na dysku z indeksem chunkow i rozpakowanymi danymi IDAT, adresowany skrotem pliku,
+# zeby kolejne przebiegi na tym samym obrazie nie parsowaly i nie rozpakowywaly go od nowa
+# kazdy wpis to katalog <sha256 pliku> z chunki.json i dane.bin; czas modyfikacji katalogu
+# odswiezamy przy kazdym uzyciu i po nim usuwamy najdawniej uzywane wpisy ponad limit
+DOMYSLNY_LIMIT_CACHE = 2 ** 30
+
+def skrot_pliku(sciezka, rozmiar_kawalka=2 ** 20):
+    skrot = hashlib.sha256()
+    with open(sciezka, 'rb') as f:
+        for kawalek in iter(lambda: f.read(rozmiar_kawalka), b''):
+            skrot.update(kawalek)
+    return skrot.hexdigest()
+
+# wpis cache to katalog nazwany skrotem SHA-256 pliku, zawierajacy dokladnie te pliki
+PLIKI_WPISU = ('dane.bin', 'chunki.json')
+
+def jest_wpisem_cache(sciezka_wpisu):
+    nazwa = os.path.basename(sciezka_wpisu)
+    if len(nazwa) != 64 or any(znak not in '0123456789abcdef' for znak in nazwa):
+        return False
+    return all(os.path.isfile(os.path.join(sciezka_wpisu, plik)) for plik in PLIKI_WPISU)
+
+def rozmiar_wpisu(sciezka_wpisu):
+    return sum(os.path.getsize(os.path.join(sciezka_wpisu, plik)) for plik in PLIKI_WPISU)
+
+# usuwane sa tylko rozpoznane wpisy, wiec --cache wskazujace na katalog z innymi danymi ich nie ruszy;
+# wpis usuniety w miedzyczasie przez inny proces po prostu znika z listy
+def przytnij_cache(katalog, limit, chroniony=None):
+    czasy, rozmiary = {}, {}
+    for nazwa in os.listdir(katalog):
+        wpis = os.path.join(katalog, nazwa)
+        if not jest_wpisem_cache(wpis):
+            continue
+        try:
+            czasy[wpis] = os.path.getmtime(wpis)
+            rozmiary[wpis] = rozmiar_wpisu(wpis)
+        except FileNotFoundError:
+            czasy.pop(wpis, None)
+    wpisy = sorted(rozmiary, key=czasy.get)
+    razem = sum(rozmiary.values())
+    for wpis in wpisy:
+        if razem <= limit:
+            break
+        if wpis == chroniony:
+            continue
+        shutil.rmtree(wpis, ignore_errors=True)
+        razem -= rozmiary[wpis]
+
+# zwraca sciezke wpisu dla pliku i czy byl juz w cache
+# nowy wpis jest zapisywany strumieniowo do katalogu tymczasowego i dopiero potem przemianowany
+def zapewnij_cache(sciezka, katalog, limit=DOMYSLNY_LIMIT_CACHE):
+    sciezka_wpisu = os.path.join(katalog, skrot_pliku(sciezka))
+    if os.path.isdir(sciezka_wpisu):
+        if jest_wpisem_cache(sciezka_wpisu):
+            os.utime(sciezka_wpisu)
+            return sciezka_wpisu, True
+        # niekompletny wpis (np. ktos usunal plik recznie) traktujemy jak brak w cache
+        shutil.rmtree(sciezka_wpisu, ignore_errors=True)
+
+    os.makedirs(katalog, exist_ok=True)
+    tymczasowy = tempfile.mkdtemp(suffix='.tmp', dir=katalog)
+    chunki, _ = przeglad_chunkow(sciezka)
+    with open(os.path.join(tymczasowy, 'dane.bin'), 'wb') as f:
+        for kawalek in rozpakuj_strumieniowo(czytaj_idat_strumieniowo(sciezka)):
+            f.write(kawalek)
+    with open(os.path.join(tymczasowy, 'chunki.json'), 'w') as f:
+        json.dump(chunki_do_json(chunki), f)
+    try:
+        os.rename(tymczasowy, sciezka_wpisu)
+    except OSError:
+        # inny proces zdazyl zapisac ten sam wpis
+        shutil.rmtree(tymczasowy, ignore_errors=True)
+    przytnij_cache(katalog, limit, sciezka_wpisu)
+    return sciezka_wpisu, False
+
+# chunki z cache maja w miejscu IDAT pusty znacznik, tak jak z przeglad_chunkow
+def wczytaj_chunki_z_cache(sciezka_wpisu):
+    with open(os.path.join(sciezka_wpisu, 'chunki.json')) as f:
+        return chunki_z_json(json.load(f))
+
+# rozpakowane dane mapowane w pamiec przez mmap zamiast wczytywania calego pliku
+def mapuj_dane_z_cache(sciezka_wpisu):
+    sciezka_danych = os.path.join(sciezka_wpisu, 'dane.bin')
+    if os.path.getsize(sciezka_danych) == 0:
+        return b''
+    with open(sciezka_danych, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def czytaj_dane_z_cache(sciezka_wpisu, rozmiar_kawalka=64 * 1024):
+    with open(os.path.join(sciezka_wpisu, 'dane.bin'), 'rb') as f:
+        for kawalek in iter(lambda: f.read(rozmiar_kawalka), b''):
+            yield kawalek
+
+# strumieniowe odszyfrowanie obrazu; jesli ma chunk ze skrotem, to dlugosc danych i rozmiar bloku
+# bierzemy z niego i porownujemy skrot odszyfrowanych danych (True/False, bez chunka None)
+# w pamieci jest tylko jedna partia, wiec moze to robic osobne zadanie bez oryginalu
+def odszyfruj_obraz(sciezka, d, n, tryb, sciezka_wy, rozmiar_bloku=None, dlugosc=None,
+                    partia=MAKS_PARTIA, tryb_postepu='brak'):
+    chunki, _ = przeglad_chunkow(sciezka)
+    zapisany = odczytaj_skrot(chunki)
+    if zapisany:
+        dlugosc, rozmiar_bloku, oczekiwany = zapisany
+    if dlugosc is None or rozmiar_bloku is None:
+        raise ValueError(f"Obraz {sciezka} nie ma chunka {TYP_SKROTU}, trzeba podać --dlugosc i --rozmiar-bloku")
+    if rozmiar_bloku * 8 >= n.bit_length():
+        raise ValueError("Klucz nie pasuje do obrazu - blok jest za duży dla tego klucza")
+
+    liczba_blokow = (dlugosc + rozmiar_bloku - 1) // rozmiar_bloku
+    postep = utworz_postep(f"{tryb.upper()} deszyfrowanie", liczba_blokow, rozmiar_bloku, tryb_postepu)
+    skrot = hashlib.sha256()
+    kawalki = rozpakuj_strumieniowo(czytaj_idat_strumieniowo(sciezka))
+    odszyfrowane = odszyfruj_strumieniowo(kawalki, d, n, rozmiar_bloku, tryb, partia, dlugosc, postep)
+    zapisz_obraz_strumieniowo(chunki, licz_skrot(odszyfrowane, skrot), sciezka_wy)
+    return skrot.digest() == oczekiwany if zapisany else None
+
+def wypisz_weryfikacje(zgodne):
+    if zgodne:
+        print("Dane po odszyfrowaniu są zgodne z oryginałem.")
+    else:
+        print("Błąd: dane po odszyfrowaniu nie są zgodne z oryginałem.")
+
+# caly przebieg main (ECB i CBC w obie strony) bez trzymania obrazu w pamieci
+# z wpisem cache dane czytamy z niego zamiast rozpakowywac IDAT przy kazdym trybie
+def przetworz_strumieniowo(sciezka, chunki, rozmiar_danych, n, e, d, rozmiar_bloku, partia, tryb_postepu,
+                           weryfikuj=False, wpis_cache=None):
+    # rozmiar_danych z IHDR sluzy tylko do postepu, dlugosc do odszyfrowania liczymy z danych
+    liczba_blokow = (rozmiar_danych + rozmiar_bloku - 1) // rozmiar_bloku
+    print(f"Liczba bloków: {liczba_blokow}")
+    for tryb in ('ecb', 'cbc'):
+        nazwa = tryb.upper()
+        plik_zaszyfrowany = f"zaszyfrowany_{tryb}.png"
+        plik_odszyfrowany = f"odszyfrowany_{tryb}.png"
+
+        if wpis_cache:
+            dane = czytaj_dane_z_cache(wpis_cache)
+        else:
+            dane = rozpakuj_strumieniowo(czytaj_idat_strumieniowo(sciezka))
+        partie = partie_blokow(dane, rozmiar_bloku, partia)
+        postep = utworz_postep(f"{nazwa} szyfrowanie", liczba_blokow, rozmiar_bloku, tryb_postepu)
+        skrot = hashlib.sha256() if weryfikuj else None
+        stan = {'dlugosc': 0}
+        dodatkowe = (lambda: [chunk_skrotu(skrot.digest(), stan['dlugosc'], rozmiar_bloku)]) if weryfikuj else None
+        zaszyfrowane = szyfruj_strumieniowo(partie, e, n, rozmiar_bloku, tryb, postep, skrot, stan)
+        zapisz_obraz_strumieniowo(chunki, zaszyfrowane, plik_zaszyfrowany, dodatkowe_chunki=dodatkowe)
+        print(f"Zapisano zaszyfrowany obraz RSA-{nazwa} jako {plik_zaszyfrowany}")
+        raport_pamieci(f"szyfrowanie {nazwa}")
+
+        zgodne = odszyfruj_obraz(plik_zaszyfrowany, d, n, tryb, plik_odszyfrowany, rozmiar_bloku, stan['dlugosc'],
+                                 partia, tryb_postepu)
+        print(f"Zapisano odszyfrowany obraz RSA-{nazwa} jako {plik_odszyfrowany}")
+        if weryfikuj:
+            wypisz_weryfikacje(zgodne)
+        raport_pamieci(f"deszyfrowanie {nazwa}")
+
+# --publiczny zapisuje dodatkowo plik z samym n i e dla polecen shard i work,
+# zeby klucz prywatny nie musial trafiac na wezly
+def polecenie_klucze(argumenty):
+    pula = wyciagnij_opcje(argumenty, '--pula')
+    publiczny = wyciagnij_opcje(argumenty, '--publiczny')
+    if len(argumenty) < 1:
+        print("Użycie: python script.py klucze <plik_klucza> [bity] [--pula plik_puli] [--publiczny plik_klucza_publicznego]")
+        return
+    bity = int(argumenty[1]) if len(argumenty) > 1 else 1024
+    p, q, n, phi, e, d = generuj_klucze(bity, pula)
+    zapisz_klucz(argumenty[0], n, e, d)
+    print(f"Zapisano klucz do {argumenty[0]}")
+    if publiczny:
+        zapisz_klucz(publiczny, n, e)
+        print(f"Zapisano klucz publiczny do {publiczny}")
+
+def polecenie_shard(argumenty):
+    if len(argumenty) < 4:
+        print("Użycie: python script.py shard <plik_png> <liczba_shardow> <katalog> <plik_klucza_publicznego> [rozmiar_bloku]")
+        return
+    rozmiar_bloku = int(argumenty[4]) if len(argumenty) > 4 else 1024 // 16
+    sciezka_manifestu = podziel_na_shardy(argumenty[0], int(argumenty[1]), argumenty[2], rozmiar_bloku,
+                                          argumenty[3])
+    print(f"Zapisano manifest jako {sciezka_manifestu}")
+
+def polecenie_work(argumenty):
+    tryb_postepu = wyciagnij_opcje(argumenty, '--postep', 'tekst')
+    if len(argumenty) < 3:
+        print("Użycie: python script.py work <manifest> <numer_sharda> <plik_klucza_publicznego> [--postep tekst|json|brak]")
+        return
+    sciezka_wy = szyfruj_shard(argumenty[0], int(argumenty[1]), argumenty[2], tryb_postepu)
+    print(f"Zapisano zaszyfrowany shard jako {sciezka_wy}")
+
+def polecenie_merge(argumenty):
+    if len(argumenty) < 2:
+        print("Użycie: python script.py merge <manifest> <plik_wyjsciowy_png>")
+        return
+    scal_shardy(argumenty[0], argumenty[1])
+    print(f"Zapisano zaszyfrowany obraz jako {argumenty[1]}")
+
+def polecenie_prime_pool(argumenty):
+    procesy = wyciagnij_opcje(argumenty, '--procesy')
+    if len(argumenty) < 2:
+        print("Użycie: python script.py prime-pool <plik_puli> <ile> [bity] [--procesy N]")
+        return
+    bity = int(argumenty[2]) if len(argumenty) > 2 else 1024
+    wypelnij_pule(argumenty[0], bity, int(argumenty[1]), int(procesy) if procesy else None)
+    print(f"Pula {argumenty[0]} zawiera co najmniej {argumenty[1]} liczb pierwszych {bity}-bitowych")
+
+# dla obrazow bez chunka rsSK dlugosc danych i rozmiar bloku trzeba podac opcjami
+def polecenie_deszyfruj(argumenty):
+    tryb_postepu = wyciagnij_opcje(argumenty, '--postep', 'tekst')
+    rozmiar_bloku = wyciagnij_opcje(argumenty, '--rozmiar-bloku')
+    dlugosc = wyciagnij_opcje(argumenty, '--dlugosc')
+    if len(argumenty) < 4 or argumenty[2] not in ('ecb', 'cbc'):
+        print("Użycie: python script.py deszyfruj <zaszyfrowany_png> <plik_klucza> ecb|cbc <plik_wyjsciowy_png>")
+        print("       [--rozmiar-bloku N --dlugosc N] [--postep tekst|json|brak]")
+        return
+    n, e, d = wczytaj_klucz(argumenty[1])
+    try:
+        zgodne = odszyfruj_obraz(argumenty[0], d, n, argumenty[2], argumenty[3],
+                                 int(rozmiar_bloku) if rozmiar_bloku else None,
+                                 int(dlugosc) if dlugosc else None, tryb_postepu=tryb_postepu)
+    except (OverflowError, ValueError) as blad:
+        # odszyfrowany blok nie miesci sie w rozmiarze bloku albo liczba blokow nie pasuje do dlugosci,
+        # czyli klucz, tryb albo parametry sa inne niz przy szyfrowaniu
+        print(f"Błąd: nie udało się odszyfrować obrazu (zły klucz, tryb albo parametry?): {blad}")
+        sys.exit(1)
+    print(f"Zapisano odszyfrowany obraz jako {argumenty[3]}")
+    if zgodne is None:
+        print(f"Obraz nie ma chunka {TYP_SKROTU}, pominięto sprawdzenie skrótu.")
+        return
+    wypisz_weryfikacje(zgodne)
+    if not zgodne:
+        sys.exit(1)
+
+POLECENIA = {
+    'klucze': polecenie_klucze,
+    'shard': polecenie_shard,
+    'work': polecenie_work,
+    'merge': polecenie_merge,
+    'prime-pool': polecenie_prime_pool,
+    'deszyfruj': polecenie_deszyfruj,
+}
 
 def main():
-    if len(sys.argv) < 2:
-        print("Użycie: python script.py <ścieżka_do_pliku_png>")
+    argumenty = sys.argv[1:]
+    if len(argumenty) < 1:
+        print("Użycie: python script.py <ścieżka_do_pliku_png> [--postep tekst|json|brak] [--pula plik_puli]")
+        print("       [--checkpoint prefiks [--resume]] [--pamiec] [--max-memory rozmiar, np. 512M]")
+        print("       [--weryfikuj] [--klucz plik_klucza] [--cache katalog [--cache-limit rozmiar, np. 1G]]")
+        print("       python script.py klucze|shard|work|merge|prime-pool|deszyfruj ...")
         return
 
-    sciezka = sys.argv[1]
+    # bledy danych wejsciowych (zle argumenty, sumy kontrolne, klucz, checkpoint z innego przebiegu)
+    # wypisujemy bez tracebacku
+    try:
+        if argumenty[0] in POLECENIA:
+            POLECENIA[argumenty[0]](argumenty[1:])
+        else:
+            przebieg_obrazu(argumenty)
+    except ValueError as blad:
+        print(f"Błąd: {blad}")
+        sys.exit(1)
+
+# glowny przebieg: szyfrowanie i deszyfrowanie obrazu w trybach ECB i CBC
+def przebieg_obrazu(argumenty):
+    tryb_postepu = wyciagnij_opcje(argumenty, '--postep', 'tekst')
+    pula = wyciagnij_opcje(argumenty, '--pula')
+    checkpoint = wyciagnij_opcje(argumenty, '--checkpoint')
+    wznow = wyciagnij_flage(argumenty, '--resume')
+    if wznow and not checkpoint:
+        print("Opcja --resume wymaga --checkpoint <prefiks>")
+        sys.exit(1)
+    if wyciagnij_flage(argumenty, '--pamiec'):
+        tracemalloc.start()
+    limit_pamieci = wyciagnij_opcje(argumenty, '--max-memory')
+    weryfikuj = wyciagnij_flage(argumenty, '--weryfikuj')
+    klucz_z_opcji = wyciagnij_opcje(argumenty, '--klucz')
+    cache = wyciagnij_opcje(argumenty, '--cache')
+    limit_cache = parsuj_rozmiar(wyciagnij_opcje(argumenty, '--cache-limit', str(DOMYSLNY_LIMIT_CACHE)))
+    sciezka = argumenty[0]
 
     if not os.path.exists(sciezka):
         print(f"Plik '{sciezka}' nie istnieje.")
         sys.exit(1)
 
-    bity = 1024
-    p, q, n, phi, e, d = generuj_klucze(bity)
-    print(f"p: {p}")
-    print(f"q: {q}")
-    print(f"n = p * q: {n}")
-    print(f"phi: {phi}")
-    print(f"e: {e}")
-    print(f"d: {d}")
-
-    bajty = wczytaj_bajty(sciezka)
-    chunki = parse_chunks(bajty)
-    surowe_dane = dane_idat(chunki)
-    rozpakowane = zlib.decompress(surowe_dane)
+    # bez --resume nie ruszamy istniejacego checkpointu ani jego klucza,
+    # bo zapomniana flaga wyrzucilaby cala policzona juz prace
+    if checkpoint and not wznow:
+        istniejace = [plik for plik in (checkpoint + '.ecb.ckpt', checkpoint + '.cbc.ckpt')
+                      + (() if klucz_z_opcji else (checkpoint + '.klucz.json',)) if os.path.exists(plik)]
+        if istniejace:
+            print(f"Błąd: checkpoint już istnieje ({', '.join(istniejace)}).")
+            print("Użyj --resume, żeby go kontynuować, albo usuń te pliki lub podaj inny prefiks.")
+            sys.exit(1)
 
+    bity = 1024
     rozmiar_bloku = bity // 16
+
+    # przy limicie pamieci najpierw szacujemy potrzeby z IHDR i rozmiaru IDAT,
+    # zeby ewentualnie przerwac zanim zaczniemy liczyc klucze i szyfrowac
+    partia = None
+    if limit_pamieci:
+        limit = parsuj_rozmiar(limit_pamieci)
+        chunki, rozmiar_idat = przeglad_chunkow(sciezka)
+        ihdr = next(dane for typ, dane, _ in chunki if typ == 'IHDR')
+        rozmiar_danych = rozmiar_rozpakowanych(ihdr)
+        rozmiar_szyfrogramu = 2 * bity // 8
+        potrzeba = oszacuj_pamiec_wsadowa(os.path.getsize(sciezka), rozmiar_idat, rozmiar_danych,
+                                          rozmiar_bloku, rozmiar_szyfrogramu)
+        print(f"Szacowana pamięć: {potrzeba / 2 ** 20:.1f} MiB, limit: {limit / 2 ** 20:.1f} MiB")
+        if potrzeba > limit:
+            partia = dobierz_partie(limit, rozmiar_bloku, rozmiar_szyfrogramu)
+            if partia < 1:
+                print("Błąd: limit pamięci jest za mały nawet na tryb strumieniowy.")
+                sys.exit(1)
+            if checkpoint:
+                print("Błąd: obraz nie mieści się w limicie pamięci, a --checkpoint wymaga trybu wsadowego.")
+                sys.exit(1)
+            print(f"Tryb strumieniowy, partia {partia} bloków")
+    # przy wznawianiu trzeba uzyc tego samego klucza, wiec z checkpointem trzymamy go w pliku
+    # --klucz pozwala uzyc (albo zapisac) klucz np. dla osobnego zadania deszyfruj
+    plik_klucza = klucz_z_opcji or (checkpoint + '.klucz.json' if checkpoint else None)
+    if (wznow or klucz_z_opcji) and os.path.exists(plik_klucza):
+        n, e, d = wczytaj_klucz(plik_klucza)
+        print(f"Wczytano klucz z {plik_klucza}")
+        print(f"n = p * q: {n}")
+        print(f"e: {e}")
+        print(f"d: {d}")
+    else:
+        p, q, n, phi, e, d = generuj_klucze(bity, pula)
+        print(f"p: {p}")
+        print(f"q: {q}")
+        print(f"n = p * q: {n}")
+        print(f"phi: {phi}")
+        print(f"e: {e}")
+        print(f"d: {d}")
+        if plik_klucza:
+            zapisz_klucz(plik_klucza, n, e, d)
+
+    wpis_cache = None
+    if cache:
+        wpis_cache, trafienie = zapewnij_cache(sciezka, cache, limit_cache)
+        print(f"Cache: {'trafienie' if trafienie else 'nowy wpis'} {wpis_cache}")
+
+    if partia:
+        przetworz_strumieniowo(sciezka, chunki, rozmiar_danych, n, e, d, rozmiar_bloku, partia, tryb_postepu,
+                               weryfikuj, wpis_cache)
+        return
+
+    if wpis_cache:
+        chunki = wczytaj_chunki_z_cache(wpis_cache)
+        rozpakowane = mapuj_dane_z_cache(wpis_cache)
+    else:
+        bajty = wczytaj_bajty(sciezka)
+        chunki = parse_chunks(bajty)
+        surowe_dane = dane_idat(chunki)
+        rozpakowane = zlib.decompress(surowe_dane)
+        # chunki trzymaja juz kopie danych, wiec caly plik i sklejony IDAT nie sa potrzebne
+        del bajty, surowe_dane
+
     bloki = [rozpakowane[i:i + rozmiar_bloku] for i in range(0, len(rozpakowane), rozmiar_bloku)]
 
     print(f"Liczba bloków: {len(bloki)}")
+    skrot = hashlib.sha256(rozpakowane) if checkpoint or weryfikuj else None
+    skrot_danych = skrot.hexdigest() if checkpoint else None
+    # bloki sa osobnymi kopiami, a do odszyfrowania wystarczy dlugosc,
+    # a przy weryfikacji skrot zapisany w zaszyfrowanym obrazie
+    dlugosc_danych = len(rozpakowane)
+    del rozpakowane
+    dodatkowe = [chunk_skrotu(skrot.digest(), dlugosc_danych, rozmiar_bloku)] if weryfikuj else []
+    raport_pamieci("wczytanie")
 
     # SZYFROWANIE ECB
-    zaszyfrowane_bloki_ecb = szyfrowanie_rsa_ecb(bloki, e, n)
+    if checkpoint:
+        _, zaszyfrowane_bloki_ecb = szyfrowanie_z_checkpointem(
+            bloki, e, n, rozmiar_bloku, 'ecb', checkpoint + '.ecb.ckpt', wznow, skrot_danych,
+            tryb_postepu=tryb_postepu)
+    else:
+        zaszyfrowane_bloki_ecb = szyfrowanie_rsa_ecb(
+            bloki, e, n, utworz_postep("ECB szyfrowanie", len(bloki), rozmiar_bloku, tryb_postepu))
     zaszyfrowane_dane_ecb = polacz_bloki(zaszyfrowane_bloki_ecb)
-    zaszyfrowane_idat_ecb = zlib.compress(zaszyfrowane_dane_ecb)
-    zapisz_obraz(chunki, zaszyfrowane_idat_ecb, "zaszyfrowany_ecb.png")
+    zaszyfrowane_idat_ecb = kompresuj_rownolegle(zaszyfrowane_dane_ecb)
+    zapisz_obraz(chunki, zaszyfrowane_idat_ecb, "zaszyfrowany_ecb.png", dodatkowe)
     print("Zapisano zaszyfrowany obraz jako zaszyfrowany_ecb.png")
+    del zaszyfrowane_bloki_ecb, zaszyfrowane_dane_ecb, zaszyfrowane_idat_ecb
+    raport_pamieci("szyfrowanie ECB")
 
     # DESZYFROWANIE ECB
-    dane_zaszyfrowane_ecb = dane_idat(parse_chunks(wczytaj_bajty("zaszyfrowany_ecb.png")))
+    chunki_ecb = parse_chunks(wczytaj_bajty("zaszyfrowany_ecb.png"))
+    dane_zaszyfrowane_ecb = dane_idat(chunki_ecb)
     rozpakowane_ecb = zlib.decompress(dane_zaszyfrowane_ecb)
     block_size_encrypted = (n.bit_length() + 7) // 8
     zaszyfrowane_bloki_ecb = [rozpakowane_ecb[i:i + block_size_encrypted] for i in range(0, len(rozpakowane_ecb), block_size_encrypted)]
-    odszyfrowane_bloki_ecb = odszyfrowanie_rsa_ecb(zaszyfrowane_bloki_ecb, d, n, rozmiar_bloku)
-    odszyfrowane_dane_ecb = polacz_bloki(odszyfrowane_bloki_ecb)[:len(rozpakowane)]
-    odszyfrowane_idat_ecb = zlib.compress(odszyfrowane_dane_ecb)
+    odszyfrowane_bloki_ecb = odszyfrowanie_rsa_ecb(
+        zaszyfrowane_bloki_ecb, d, n, rozmiar_bloku,
+        utworz_postep("ECB deszyfrowanie", len(zaszyfrowane_bloki_ecb), rozmiar_bloku, tryb_postepu),
+        dlugosc_danych)
+    odszyfrowane_dane_ecb = polacz_bloki(odszyfrowane_bloki_ecb)
+    odszyfrowane_idat_ecb = kompresuj_rownolegle(odszyfrowane_dane_ecb)
     zapisz_obraz(chunki, odszyfrowane_idat_ecb, "odszyfrowany_ecb.png")
     print("Zapisano odszyfrowany obraz RSA-ECB jako odszyfrowany_ecb.png")
+    if weryfikuj:
+        wypisz_weryfikacje(hashlib.sha256(odszyfrowane_dane_ecb).digest() == odczytaj_skrot(chunki_ecb)[2])
+    del chunki_ecb, dane_zaszyfrowane_ecb, rozpakowane_ecb, zaszyfrowane_bloki_ecb
+    del odszyfrowane_bloki_ecb, odszyfrowane_dane_ecb, odszyfrowane_idat_ecb
+    raport_pamieci("deszyfrowanie ECB")
 
     # SZYFROWANIE CBC
-    iv, zaszyfrowane_bloki_cbc = szyfrowanie_rsa_cbc(bloki, e, n, rozmiar_bloku)
+    if checkpoint:
+        iv, zaszyfrowane_bloki_cbc = szyfrowanie_z_checkpointem(
+            bloki, e, n, rozmiar_bloku, 'cbc', checkpoint + '.cbc.ckpt', wznow, skrot_danych,
+            tryb_postepu=tryb_postepu)
+    else:
+        iv, zaszyfrowane_bloki_cbc = szyfrowanie_rsa_cbc(
+            bloki, e, n, rozmiar_bloku, utworz_postep("CBC szyfrowanie", len(bloki), rozmiar_bloku, tryb_postepu))
     zaszyfrowane_dane_cbc = polacz_bloki(zaszyfrowane_bloki_cbc)
-    zaszyfrowane_idat_cbc = zlib.compress(iv + zaszyfrowane_dane_cbc)
-    zapisz_obraz(chunki, zaszyfrowane_idat_cbc, "zaszyfrowany_cbc.png")
+    zaszyfrowane_idat_cbc = kompresuj_rownolegle(iv + zaszyfrowane_dane_cbc)
+    zapisz_obraz(chunki, zaszyfrowane_idat_cbc, "zaszyfrowany_cbc.png", dodatkowe)
     print("Zapisano zaszyfrowany obraz RSA-CBC jako zaszyfrowany_cbc.png")
+    del zaszyfrowane_bloki_cbc, zaszyfrowane_dane_cbc, zaszyfrowane_idat_cbc
+    raport_pamieci("szyfrowanie CBC")
 
     # DESZYFROWANIE CBC
-    dane_zaszyfrowane_cbc = dane_idat(parse_chunks(wczytaj_bajty("zaszyfrowany_cbc.png")))
+    chunki_cbc = parse_chunks(wczytaj_bajty("zaszyfrowany_cbc.png"))
+    dane_zaszyfrowane_cbc = dane_idat(chunki_cbc)
     rozpakowane_cbc = zlib.decompress(dane_zaszyfrowane_cbc)
     iv_odszyfrowanie = rozpakowane_cbc[:rozmiar_bloku]
     dane_bez_iv = rozpakowane_cbc[rozmiar_bloku:]
     zaszyfrowane_bloki_cbc = [dane_bez_iv[i:i + block_size_encrypted] for i in range(0, len(dane_bez_iv), block_size_encrypted)]
-    odszyfrowane_bloki_cbc = odszyfrowanie_rsa_cbc(zaszyfrowane_bloki_cbc, d, n, rozmiar_bloku, iv_odszyfrowanie)
-    odszyfrowane_dane_cbc = polacz_bloki(odszyfrowane_bloki_cbc)[:len(rozpakowane)]
-    odszyfrowane_idat_cbc = zlib.compress(odszyfrowane_dane_cbc)
+    odszyfrowane_bloki_cbc = odszyfrowanie_rsa_cbc(
+        zaszyfrowane_bloki_cbc, d, n, rozmiar_bloku, iv_odszyfrowanie,
+        utworz_postep("CBC deszyfrowanie", len(zaszyfrowane_bloki_cbc), rozmiar_bloku, tryb_postepu),
+        dlugosc_danych)
+    odszyfrowane_dane_cbc = polacz_bloki(odszyfrowane_bloki_cbc)
+    odszyfrowane_idat_cbc = kompresuj_rownolegle(odszyfrowane_dane_cbc)
     zapisz_obraz(chunki, odszyfrowane_idat_cbc, "odszyfrowany_cbc.png")
     print("Zapisano odszyfrowany obraz RSA-CBC jako odszyfrowany_cbc.png")
+    if weryfikuj:
+        wypisz_weryfikacje(hashlib.sha256(odszyfrowane_dane_cbc).digest() == odczytaj_skrot(chunki_cbc)[2])
+    raport_pamieci("deszyfrowanie CBC")
 
 
 
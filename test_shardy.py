@@ -0,0 +1,75 @@
+# test polecen shard / work / merge: kazdy shard szyfruje osobny proces, tak jak osobny wezel
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+
+from skrypt_new11 import dane_idat, parse_chunks, wczytaj_bajty
+
+KATALOG = os.path.dirname(os.path.abspath(__file__))
+SKRYPT = os.path.join(KATALOG, 'skrypt_new11.py')
+OBRAZ = os.path.join(KATALOG, 'indexed.png')
+
+def uruchom(*argumenty):
+    return subprocess.run([sys.executable, SKRYPT, *argumenty], capture_output=True, text=True)
+
+def rozpakowane(sciezka):
+    return zlib.decompress(dane_idat(parse_chunks(wczytaj_bajty(sciezka))))
+
+class TestShardy(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.katalog = self.tmp.name
+        self.klucz = os.path.join(self.katalog, 'klucz.json')
+        self.publiczny = os.path.join(self.katalog, 'publiczny.json')
+        self.shardy = os.path.join(self.katalog, 'shardy')
+        self.manifest = os.path.join(self.shardy, 'manifest.json')
+        self.assertEqual(uruchom('klucze', self.klucz, '256', '--publiczny', self.publiczny).returncode, 0)
+        wynik = uruchom('shard', OBRAZ, '3', self.shardy, self.publiczny, '16')
+        self.assertEqual(wynik.returncode, 0, wynik.stdout + wynik.stderr)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def zaszyfruj_shardy(self):
+        # wszystkie wezly naraz, kazdy tylko z kluczem publicznym
+        procesy = [subprocess.Popen([sys.executable, SKRYPT, 'work', self.manifest, str(i), self.publiczny,
+                                     '--postep', 'brak'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                   for i in range(3)]
+        for proces in procesy:
+            proces.communicate()
+            self.assertEqual(proces.returncode, 0)
+
+    def test_merge_i_deszyfrowanie(self):
+        self.zaszyfruj_shardy()
+        scalony = os.path.join(self.katalog, 'scalony.png')
+        self.assertEqual(uruchom('merge', self.manifest, scalony).returncode, 0)
+        odszyfrowany = os.path.join(self.katalog, 'odszyfrowany.png')
+        wynik = uruchom('deszyfruj', scalony, self.klucz, 'ecb', odszyfrowany, '--postep', 'brak')
+        self.assertEqual(wynik.returncode, 0, wynik.stdout + wynik.stderr)
+        self.assertEqual(rozpakowane(odszyfrowany), rozpakowane(OBRAZ))
+
+    def test_brak_opisu_sharda(self):
+        self.zaszyfruj_shardy()
+        os.remove(os.path.join(self.shardy, 'shard_001.bin.enc.json'))
+        wynik = uruchom('merge', self.manifest, os.path.join(self.katalog, 'scalony.png'))
+        self.assertEqual(wynik.returncode, 1)
+        self.assertIn('Błąd:', wynik.stdout)
+        self.assertNotIn('Traceback', wynik.stderr)
+
+    def test_inny_klucz(self):
+        inny = os.path.join(self.katalog, 'inny.json')
+        self.assertEqual(uruchom('klucze', inny, '256').returncode, 0)
+        wynik = uruchom('work', self.manifest, '0', inny, '--postep', 'brak')
+        self.assertEqual(wynik.returncode, 1)
+        self.assertIn('Klucz nie pasuje', wynik.stdout)
+
+    def test_zly_numer_sharda(self):
+        wynik = uruchom('work', self.manifest, '3', self.publiczny, '--postep', 'brak')
+        self.assertEqual(wynik.returncode, 1)
+        self.assertIn('Błąd:', wynik.stdout)
+
+if __name__ == '__main__':
+    unittest.main()